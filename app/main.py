@@ -11,11 +11,19 @@ from dateutil.relativedelta import relativedelta
 from typing import List
 from dash.dependencies import Input, Output
 
+
+def to_central_time(time: pd.Series) -> pd.Series:
+    # Extracts write the time as epoch millis, older ones wrote ISO strings.
+    if pd.api.types.is_numeric_dtype(time):
+        utc_time = pd.to_datetime(time, unit="ms", utc=True)
+    else:
+        utc_time = pd.to_datetime(time, utc=True, cache=True)
+    return utc_time.dt.tz_convert("America/Chicago")
+
+
 profanity = pd.read_csv("data/election_night_extract.csv")
 state_calls = pd.read_csv("data/state_results.csv")
-profanity.loc[:, "time_central"] = pd.to_datetime(
-    profanity.time
-).dt.tz_convert("America/Chicago")
+profanity.loc[:, "time_central"] = to_central_time(profanity.time)
 profanity.loc[:, "subject"] = profanity.subject.map(lambda x: x.capitalize())
 
 start_time = profanity.time_central.min()
@@ -0,0 +1,123 @@
+"""Times marshal_results against the row-by-row loop it replaced on a
+synthetic day of extract results (1440 minutes, 5 words, 20 targets).
+
+    python benchmarks/benchmark_marshal_results.py
+
+with the package installed (pip install -e .).
+"""
+import csv
+import io
+import random
+import timeit
+
+from itertools import product
+from toolz import get_in
+
+from profanity_power_index.extract_profanity import marshal_results
+
+WORDS = ["fuck", "shit", "bitch", "ass", "dick"]
+TARGETS = [f"subject{target}" for target in range(20)]
+MINUTES = 1440
+START_MILLIS = 1603411200000
+REPEAT = 10
+
+
+def synthetic_buckets(minutes=MINUTES, words=WORDS, targets=TARGETS, seed=1):
+    """Builds tweets_per_minute buckets shaped like the Elasticsearch
+    response, mostly zero like a real day.
+    """
+    random.seed(seed)
+    time_buckets = []
+    for minute in range(minutes):
+        profanity_buckets = {}
+        for word in words:
+            target_buckets = {
+                target: {"doc_count": random.choice([0, 0, 0, 1, 5, 20])}
+                for target in targets
+            }
+            profanity_buckets[word] = {
+                "doc_count": sum(
+                    bucket["doc_count"] for bucket in target_buckets.values()
+                ),
+                "target": {"buckets": target_buckets},
+            }
+        time_buckets.append(
+            {
+                "key": START_MILLIS + minute * 60000,
+                "doc_count": sum(
+                    bucket["doc_count"]
+                    for bucket in profanity_buckets.values()
+                ),
+                "profanity": {"buckets": profanity_buckets},
+            }
+        )
+    return time_buckets
+
+
+def loop_marshal_results(time_buckets, words, targets):
+    """The product/get_in loop extract used before marshal_results."""
+    return [
+        {
+            "time": time_bucket["key"],
+            "word": profanity,
+            "subject": target,
+            "count": get_in(
+                [
+                    "profanity",
+                    "buckets",
+                    profanity,
+                    "target",
+                    "buckets",
+                    target,
+                    "doc_count",
+                ],
+                time_bucket,
+                0,
+            ),
+        }
+        for time_bucket, profanity, target in product(
+            time_buckets, words, targets
+        )
+    ]
+
+
+def _loop_to_csv(time_buckets):
+    csv_out = io.StringIO()
+    writer = csv.DictWriter(
+        csv_out, fieldnames=["time", "word", "subject", "count"]
+    )
+    writer.writeheader()
+    writer.writerows(loop_marshal_results(time_buckets, WORDS, TARGETS))
+    return csv_out.getvalue()
+
+
+def _frame_to_csv(time_buckets):
+    return marshal_results(time_buckets, WORDS, TARGETS).to_csv(index=False)
+
+
+def _best(function, time_buckets):
+    return min(
+        timeit.repeat(lambda: function(time_buckets), number=1, repeat=REPEAT)
+    )
+
+
+def main():
+    time_buckets = synthetic_buckets()
+    print(f"{MINUTES} minutes x {len(WORDS)} words x {len(TARGETS)} targets")
+    print(f"best of {REPEAT}, seconds")
+    for name, loop, frame in [
+        (
+            "marshal",
+            lambda buckets: loop_marshal_results(buckets, WORDS, TARGETS),
+            lambda buckets: marshal_results(buckets, WORDS, TARGETS),
+        ),
+        ("marshal + csv", _loop_to_csv, _frame_to_csv),
+    ]:
+        print(
+            f"{name:<14} loop {_best(loop, time_buckets):.3f}  "
+            f"marshal_results {_best(frame, time_buckets):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
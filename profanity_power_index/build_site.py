@@ -1,17 +1,49 @@
+import gzip
+import hashlib
+import importlib_resources
+import json
+import os
+import re
+import shutil
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from glob import glob
 from toolz import assoc
 from jinja2 import Environment, PackageLoader, select_autoescape
+from loguru import logger
 from palettable.colorbrewer import sequential as brewer_sequential
 from palettable.colorbrewer import diverging as brewer_diverging
 from palettable.colorbrewer import qualitative as brewer_qualitative
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TEMPLATE_NAME = "profanity_power_index.html.jinja"
+SCRIPT_NAME = "profanity_power_index.js"
+# Written next to index.html, holds the hash of everything the site was
+# rendered from.
+BUILD_HASH_FILE = ".build_hash"
+# Precompressed copies written next to the page and data of bundled sites.
+COMPRESSED_SUFFIXES = [".gz", ".br"]
+
+# Copies of the CDN assets the template links to (Bootstrap 3.3.5, D3 3.5.17),
+# inlined into bundled sites. jQuery and the Bootstrap JS are left out, the
+# site only uses the Bootstrap grid.
+VENDOR_STYLESHEETS = ["bootstrap.min.css", "bootstrap-theme.min.css"]
+VENDOR_SCRIPTS = ["d3.v3.min.js"]
+
 env = Environment(
     loader=PackageLoader("profanity_power_index", "resources"),
     autoescape=select_autoescape(["html"]),
 )
 
 
-def _make_colors(subject_config):
-    scheme_name = f"{subject_config['colors']}_5"
+@lru_cache(maxsize=None)
+def _color_scheme_colors(colors):
+    scheme_name = f"{colors}_5"
     if hasattr(brewer_sequential, scheme_name):
         color_scheme = getattr(brewer_sequential, scheme_name)
     elif hasattr(brewer_diverging, scheme_name):
@@ -35,11 +67,266 @@ def _make_colors(subject_config):
     }
 
 
-def build_site(site_config, data_file):
+def _make_colors(subject_config):
+    return _color_scheme_colors(subject_config["colors"])
+
+
+def build_site(
+    site_config, data_file, script_location=f"js/{SCRIPT_NAME}", bundle=None
+):
     subjects = [
         assoc(s, "colors", _make_colors(s)) for s in site_config["subjects"]
     ]
 
-    return env.get_template("profanity_power_index.html.jinja").render(
-        subjects=subjects, file_location=data_file
+    return env.get_template(TEMPLATE_NAME).render(
+        subjects=subjects,
+        file_location=data_file,
+        script_location=script_location,
+        bundle=bundle,
+    )
+
+
+@lru_cache(maxsize=None)
+def _script_source():
+    return (
+        importlib_resources.files("profanity_power_index.resources")
+        .joinpath(SCRIPT_NAME)
+        .read_bytes()
+    )
+
+
+@lru_cache(maxsize=None)
+def _template_source():
+    return env.loader.get_source(env, TEMPLATE_NAME)[0]
+
+
+def _vendor_asset(asset_name):
+    return (
+        importlib_resources.files("profanity_power_index.resources")
+        .joinpath("vendor", asset_name)
+        .read_text(encoding="utf-8")
+    )
+
+
+# Only strips comments that aren't inside a string, and keeps the newlines so
+# automatic semicolon insertion still works.
+_JS_LINE_COMMENT = re.compile(
+    r"""^((?:[^"'/\n]|"[^"\n]*"|'[^'\n]*'|/(?!/))*)//.*$""", re.MULTILINE
+)
+
+
+def _minify_script(source):
+    return "\n".join(
+        line.strip()
+        for line in _JS_LINE_COMMENT.sub(r"\1", source).splitlines()
+        if line.strip()
+    )
+
+
+def _inline(source, tag):
+    # Keeps the inlined source from closing the surrounding tag early.
+    return source.replace(f"</{tag}", f"<\\/{tag}")
+
+
+@lru_cache(maxsize=None)
+def _bundle_assets():
+    return {
+        "css": _inline(
+            "\n".join(_vendor_asset(name) for name in VENDOR_STYLESHEETS),
+            "style",
+        ),
+        "script": _inline(
+            "\n".join(
+                [_vendor_asset(name) for name in VENDOR_SCRIPTS]
+                + [_minify_script(_script_source().decode("utf-8"))]
+            ),
+            "script",
+        ),
+    }
+
+
+def _require_brotli():
+    if brotli is None:
+        raise ImportError(
+            "Bundled builds need brotli for the .br copies. "
+            "pip install brotli."
+        )
+
+
+def _write_compressed(path):
+    """Writes .gz and .br siblings of path for static hosts that serve
+    precompressed files.
+    """
+    with open(path, "rb") as file_in:
+        content = file_in.read()
+    # mtime=0 keeps the output identical between builds.
+    with open(f"{path}.gz", "wb") as gzip_out:
+        with gzip.GzipFile(
+            filename="", mode="wb", fileobj=gzip_out, mtime=0
+        ) as gzip_file:
+            gzip_file.write(content)
+    with open(f"{path}.br", "wb") as brotli_out:
+        brotli_out.write(brotli.compress(content))
+
+
+def _remove_compressed(path):
+    for suffix in COMPRESSED_SUFFIXES:
+        if os.path.exists(f"{path}{suffix}"):
+            logger.info(f"Removing stale {path}{suffix}.")
+            os.remove(f"{path}{suffix}")
+
+
+def _file_hash(path):
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file_in:
+        for chunk in iter(lambda: file_in.read(1 << 16), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def write_script(asset_dir):
+    """Writes the site script under a content-hashed name to asset_dir,
+    returning the file name. Does nothing if it's already there.
+    """
+    source = _script_source()
+    script_name = (
+        f"{os.path.splitext(SCRIPT_NAME)[0]}."
+        f"{hashlib.sha256(source).hexdigest()[:12]}.js"
+    )
+    script_path = os.path.join(asset_dir, script_name)
+    if not os.path.exists(script_path):
+        os.makedirs(asset_dir, exist_ok=True)
+        with open(script_path, "wb") as script_out:
+            script_out.write(source)
+    return script_name
+
+
+def _build_hash(site_config, data_file, script_location, bundle):
+    build_hash = hashlib.sha256()
+    for build_input in [
+        json.dumps(site_config, sort_keys=True),
+        _file_hash(data_file),
+        _template_source(),
+        # Bundled sites inline the assets, so they depend on their contents.
+        hashlib.sha256(
+            json.dumps(_bundle_assets(), sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        if bundle
+        else script_location,
+    ]:
+        build_hash.update(build_input.encode("utf-8"))
+    return build_hash.hexdigest()
+
+
+def write_site(
+    site_config, data_file, output_dir, script_location=None, bundle=False
+):
+    """Renders the site for site_config and data_file into output_dir.
+
+    With bundle the page is self-contained: styles, scripts and data are
+    inlined, and precompressed copies of the page and data are written
+    alongside them. Otherwise it loads the script from script_location.
+
+    Returns False without writing anything if output_dir was already built
+    from the same inputs.
+    """
+    if bundle:
+        _require_brotli()
+    build_hash = _build_hash(site_config, data_file, script_location, bundle)
+    build_hash_path = os.path.join(output_dir, BUILD_HASH_FILE)
+    index_path = os.path.join(output_dir, "index.html")
+    data_path = os.path.join(output_dir, os.path.basename(data_file))
+    outputs = [index_path, data_path]
+    if bundle:
+        outputs += [
+            f"{path}{suffix}"
+            for path in [index_path, data_path]
+            for suffix in COMPRESSED_SUFFIXES
+        ]
+    # A deleted output means the site needs rebuilding whatever the hash says.
+    if os.path.exists(build_hash_path) and all(map(os.path.exists, outputs)):
+        with open(build_hash_path, "r") as build_hash_in:
+            if build_hash_in.read() == build_hash:
+                logger.info(f"{output_dir} is up to date. Skipping.")
+                return False
+
+    if not os.path.exists(output_dir):
+        logger.info(f"{output_dir} does not exist. Creating.")
+        os.makedirs(output_dir)
+    shutil.copy(data_file, data_path)
+
+    site_bundle = None
+    if bundle:
+        with open(data_file, "r") as data_in:
+            site_bundle = assoc(_bundle_assets(), "data", data_in.read())
+    template = build_site(
+        site_config, os.path.basename(data_file), script_location, site_bundle
+    )
+    with open(index_path, "w") as index_out:
+        index_out.write(template)
+    if bundle:
+        _write_compressed(index_path)
+        _write_compressed(data_path)
+    else:
+        # Copies left from an earlier bundled build would be served instead.
+        _remove_compressed(index_path)
+        _remove_compressed(data_path)
+    # Written last so a failed build is never mistaken for a finished one.
+    with open(build_hash_path, "w") as build_hash_out:
+        build_hash_out.write(build_hash)
+    return True
+
+
+def _write_site_from_config(
+    config_file, data_file, output_dir, script_location, bundle
+):
+    with open(config_file, "r") as config_in:
+        site_config = json.load(config_in)
+    return write_site(
+        site_config, data_file, output_dir, script_location, bundle
     )
+
+
+def build_sites(config_dir, data_dir, output_dir, workers=None, bundle=False):
+    """Builds a site for every JSON config in config_dir into a directory of
+    the same name under output_dir, reading the data from
+    data_dir/<config name>.csv. Unless they're bundled, all of the sites
+    share one script in output_dir/js.
+    """
+    if bundle:
+        # Fail before starting the workers.
+        _require_brotli()
+        script_location = None
+    else:
+        script_location = (
+            f"../js/{write_script(os.path.join(output_dir, 'js'))}"
+        )
+
+    config_files = []
+    data_files = []
+    site_dirs = []
+    for config_file in sorted(glob(os.path.join(config_dir, "*.json"))):
+        site_name = os.path.splitext(os.path.basename(config_file))[0]
+        data_file = os.path.join(data_dir, f"{site_name}.csv")
+        if not os.path.exists(data_file):
+            logger.warning(f"No data file {data_file} for {config_file}.")
+            continue
+        config_files.append(config_file)
+        data_files.append(data_file)
+        site_dirs.append(os.path.join(output_dir, site_name))
+
+    logger.info(f"Building {len(site_dirs)} sites.")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        built = list(
+            executor.map(
+                _write_site_from_config,
+                config_files,
+                data_files,
+                site_dirs,
+                [script_location] * len(site_dirs),
+                [bundle] * len(site_dirs),
+            )
+        )
+    return {
+        site_dir: was_built for site_dir, was_built in zip(site_dirs, built)
+    }
@@ -1,39 +1,57 @@
 import click
 import os
-import elasticsearch
 import sys
-import csv
-import re
-import sh
 import json
-import importlib_resources
 
-from dotenv import load_dotenv, find_dotenv
 from loguru import logger
-from datetime import datetime
-from dateutil import tz
 
-from profanity_power_index.collect_tweets import collect_tweets
-from profanity_power_index.extract_profanity import extract_profanity
-from profanity_power_index.build_site import build_site
+# Spike detection counts tweets in buckets of this many seconds.
+SPIKE_BUCKET_SECONDS = 10
 
-load_dotenv(find_dotenv())
+# Everything heavy (Elasticsearch, Twitter, Jinja, palettable, the subcommand
+# modules) is imported inside the subcommand that needs it, so `build` and
+# `--help` don't pay for the clients `collect` uses.
 
-ELASTICSEARCH_HOST = os.getenv(
-    "ELASTICSEARCH_HOST", default="http://localhost:9200"
-)
-TWITTER_CONSUMER_KEY = os.getenv("TWITTER_CONSUMER_KEY")
-TWITTER_CONSUMER_SECRET = os.getenv("TWITTER_CONSUMER_SECRET")
-TWITTER_ACCESS_TOKEN_KEY = os.getenv("TWITTER_ACCESS_TOKEN_KEY")
-TWITTER_ACCESS_TOKEN_SECRET = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
 
-if (
-    (not TWITTER_CONSUMER_KEY)
-    or (not TWITTER_CONSUMER_SECRET)
-    or (not TWITTER_ACCESS_TOKEN_KEY)
-    or (not TWITTER_ACCESS_TOKEN_SECRET)
-):
-    logger.warn("Missing Twitter API keys - collect will not function.")
+def _load_env():
+    from dotenv import load_dotenv, find_dotenv
+
+    load_dotenv(find_dotenv())
+
+
+def _elasticsearch_client(**client_options):
+    import elasticsearch
+
+    _load_env()
+    elasticsearch_host = os.getenv(
+        "ELASTICSEARCH_HOST", default="http://localhost:9200"
+    )
+    return elasticsearch.Elasticsearch(
+        hosts=[elasticsearch_host], **client_options
+    )
+
+
+def _validate_spike_window(ctx, param, value):
+    if value % SPIKE_BUCKET_SECONDS:
+        raise click.BadParameter(
+            f"must be a multiple of {SPIKE_BUCKET_SECONDS} seconds."
+        )
+    return value
+
+
+def _twitter_credentials():
+    _load_env()
+    credentials = {
+        "twitter_consumer_key": os.getenv("TWITTER_CONSUMER_KEY"),
+        "twitter_consumer_secret": os.getenv("TWITTER_CONSUMER_SECRET"),
+        "twitter_access_token_key": os.getenv("TWITTER_ACCESS_TOKEN_KEY"),
+        "twitter_access_token_secret": os.getenv(
+            "TWITTER_ACCESS_TOKEN_SECRET"
+        ),
+    }
+    if not all(credentials.values()):
+        logger.warning("Missing Twitter API keys - collect will not function.")
+    return credentials
 
 
 @click.group()
@@ -71,7 +89,56 @@ def main():
     default=10,
     help="The batch size for bulk writing to Elasticsearch. Default: 10.",
 )
-def collect(track, elasticsearch_index, drop_index, batch_size):
+@click.option(
+    "--refresh-interval",
+    "-r",
+    type=str,
+    default="30s",
+    help="The Elasticsearch index refresh interval while collecting. "
+    "Restored to 1s when the collector stops. Default: 30s.",
+)
+@click.option(
+    "--spike-log",
+    type=click.File("a"),
+    default=None,
+    help="A file to append profanity spikes to as JSON lines. "
+    "Spike detection is off unless this is set.",
+)
+@click.option(
+    "--spike-window",
+    type=click.IntRange(min=SPIKE_BUCKET_SECONDS),
+    default=60,
+    callback=_validate_spike_window,
+    help="The window in seconds that profanity rates are measured over "
+    f"for spike detection. Must be a multiple of {SPIKE_BUCKET_SECONDS}. "
+    "Default: 60.",
+)
+@click.option(
+    "--spike-threshold",
+    type=float,
+    default=3.0,
+    help="How many standard deviations above the rolling baseline a rate "
+    "has to be to count as a spike. Default: 3.0.",
+)
+@click.option(
+    "--lexicon",
+    "-l",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="A JSON profanity lexicon to use instead of the built-in one. "
+    "See README for schema.",
+)
+def collect(
+    track,
+    elasticsearch_index,
+    drop_index,
+    batch_size,
+    refresh_interval,
+    spike_log,
+    spike_window,
+    spike_threshold,
+    lexicon,
+):
     """
     Collects tweets from the Twitter public timeline for the specified
     tracking terms that contain profanity and saves them to Elasticsearch.
@@ -87,25 +154,171 @@ def collect(track, elasticsearch_index, drop_index, batch_size):
     The elasticsearch URL can be controlled through ELASTICSEARCH_HOST, which
     defaults to "http://localhost:9200".
     """
+    from profanity_power_index.collect_tweets import collect_tweets
+
     if not track:
         logger.error("❌ Must track at least one term. ❌")
         sys.exit(1)
 
-    es = elasticsearch.Elasticsearch(hosts=[ELASTICSEARCH_HOST])
+    spike_detector = None
+    if spike_log:
+        from profanity_power_index.detect_spikes import SpikeDetector
+
+        spike_detector = SpikeDetector(
+            spike_log,
+            bucket_seconds=SPIKE_BUCKET_SECONDS,
+            window_seconds=spike_window,
+            threshold=spike_threshold,
+        )
+
+    es = _elasticsearch_client()
 
     collect_tweets(
         es,
         track,
-        twitter_consumer_key=TWITTER_CONSUMER_KEY,
-        twitter_consumer_secret=TWITTER_CONSUMER_SECRET,
-        twitter_access_token_key=TWITTER_ACCESS_TOKEN_KEY,
-        twitter_access_token_secret=TWITTER_ACCESS_TOKEN_SECRET,
+        **_twitter_credentials(),
         elasticsearch_index=elasticsearch_index,
         drop_index=drop_index,
         batch_size=batch_size,
+        refresh_interval=refresh_interval,
+        spike_detector=spike_detector,
+        lexicon_file=lexicon,
+    )
+
+
+@main.command("collect-groups")
+@click.argument("config_files", type=click.File("r"), nargs=-1)
+@click.option(
+    "--index-prefix",
+    "-p",
+    type=str,
+    default="profanity-power-index",
+    help="Each group is saved to <index prefix>-<config name>. "
+    "Default: profanity-power-index.",
+)
+@click.option(
+    "--drop-index",
+    "-d",
+    is_flag=True,
+    help="Whether to drop the elasticsearch indices prior to collecting. "
+    "Default: False.",
+)
+@click.option(
+    "--batch-size",
+    "-b",
+    type=int,
+    default=10,
+    help="The batch size for bulk writing to Elasticsearch. Default: 10.",
+)
+@click.option(
+    "--refresh-interval",
+    "-r",
+    type=str,
+    default="30s",
+    help="The Elasticsearch index refresh interval while collecting. "
+    "Restored to 1s when the collector stops. Default: 30s.",
+)
+@click.option(
+    "--queue-size",
+    "-q",
+    type=int,
+    default=1000,
+    help="How many tweets each group can fall behind by before its tweets "
+    "are dropped. Default: 1000.",
+)
+@click.option(
+    "--lexicon",
+    "-l",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="A JSON profanity lexicon to use instead of the built-in one. "
+    "See README for schema.",
+)
+def collect_groups(
+    config_files,
+    index_prefix,
+    drop_index,
+    batch_size,
+    refresh_interval,
+    queue_size,
+    lexicon,
+):
+    """
+    Collects tweets for several groups of tracking terms from one Twitter
+    stream, saving each group to its own Elasticsearch index.
+
+    Arguments:\n
+        CONFIG_FILES - Site config JSON files (see build). The subject names
+            in each config are one group of tracking terms.
+
+    Requires the same environment variables as collect.
+    """
+    from profanity_power_index.collect_tweets import collect_tweet_groups
+
+    if not config_files:
+        logger.error("❌ Must provide at least one config file. ❌")
+        sys.exit(1)
+
+    track_groups = {}
+    for config_file in config_files:
+        config_name = os.path.splitext(os.path.basename(config_file.name))[0]
+        track_groups[f"{index_prefix}-{config_name}"] = [
+            subject["name"] for subject in json.load(config_file)["subjects"]
+        ]
+
+    # One bulk connection per writer.
+    es = _elasticsearch_client(maxsize=len(track_groups))
+
+    collect_tweet_groups(
+        es,
+        track_groups,
+        **_twitter_credentials(),
+        drop_index=drop_index,
+        batch_size=batch_size,
+        refresh_interval=refresh_interval,
+        queue_size=queue_size,
+        lexicon_file=lexicon,
     )
 
 
+@main.command()
+@click.argument("source_index", type=str)
+@click.argument("dest_index", type=str)
+@click.option(
+    "--drop-index",
+    "-d",
+    is_flag=True,
+    help="Whether to drop the destination index prior to reindexing. "
+    "Default: False.",
+)
+def reindex(source_index, dest_index, drop_index):
+    """
+    Copies the tweets in an existing index into a new index with the current
+    mapping and index settings.
+
+    Arguments:\n
+        SOURCE_INDEX - The index to copy the tweets from.\n
+        DEST_INDEX - The index to copy the tweets to. Created if it doesn't
+            exist.
+    """
+    from profanity_power_index.tweet_index import reindex_tweets
+
+    if source_index == dest_index:
+        logger.error("❌ Source and destination index must differ. ❌")
+        sys.exit(1)
+
+    es = _elasticsearch_client()
+    logger.info(f"🖕 Migrating {source_index} to {dest_index}. 🖕")
+    response = reindex_tweets(
+        es, source_index, dest_index, drop_index=drop_index
+    )
+    if response["failures"]:
+        logger.error(
+            f"❌ {len(response['failures'])} tweets failed to reindex. ❌"
+        )
+        sys.exit(1)
+
+
 @main.command()
 @click.argument("start", type=str)
 @click.argument("end", type=str)
@@ -127,13 +340,32 @@ def collect(track, elasticsearch_index, drop_index, batch_size):
 @click.option(
     "--output",
     "-o",
-    type=click.File("w"),
+    type=click.File("wb"),
     default="-",
     help="The name of the output file to save the data to. Default: stdout",
 )
-def extract(start, end, track, elasticsearch_index, output):
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["csv", "parquet"]),
+    default="csv",
+    help="The format to write the data in. Parquet needs pyarrow. "
+    "Default: csv.",
+)
+@click.option(
+    "--lexicon",
+    "-l",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="A JSON profanity lexicon to use instead of the built-in one. "
+    "See README for schema.",
+)
+def extract(
+    start, end, track, elasticsearch_index, output, output_format, lexicon
+):
     """
-    Extracts data from Elasticsearch into a CSV file.
+    Extracts data from Elasticsearch into a CSV (or Parquet) file.
 
     Arguments:\n
         START - The start date as YYYY-mm-ddTHH:MM:SS. Time zone offset is
@@ -141,75 +373,127 @@ def extract(start, end, track, elasticsearch_index, output):
         END - The end date as YYYY-mm-ddTHH:MM:SS. Time zone offset is
             optional by adding +/-ZZZZ. Defaults to local system timezone.
     """
+    from profanity_power_index.extract_profanity import extract_profanity
+    from profanity_power_index.timestamps import query_time_to_epoch_millis
+
     if not track:
         logger.error("❌ Must track at least one term. ❌")
         sys.exit(1)
 
-    if not re.match(r".*\d{4}$", start):
-        time_zone = tz.gettz()
-        logger.info(f"Adding local time zone to start.")
-        start_date = datetime.strptime(start, "%Y-%m-%dT%H:%M:%S").replace(
-            tzinfo=time_zone
-        )
-        start = start_date.strftime("%Y-%m-%dT%H:%M:%S%z")
-
-    if not re.match(r".*\d{4}$", end):
-        time_zone = tz.gettz()
-        logger.info(f"Adding local time zone to end.")
-        end_date = datetime.strptime(end, "%Y-%m-%dT%H:%M:%S").replace(
-            tzinfo=time_zone
-        )
-        end = end_date.strftime("%Y-%m-%dT%H:%M:%S%z")
+    start_millis = query_time_to_epoch_millis(start)
+    end_millis = query_time_to_epoch_millis(end)
 
-    es = elasticsearch.Elasticsearch(hosts=[ELASTICSEARCH_HOST])
+    es = _elasticsearch_client()
     logger.info(
         f"🖕 Extracting profanity between {start} and {end} "
         f"for {', '.join(track)} in {elasticsearch_index}. 🖕"
     )
     results = extract_profanity(
-        es, start, end, track, elasticsearch_index=elasticsearch_index
+        es,
+        start_millis,
+        end_millis,
+        track,
+        elasticsearch_index=elasticsearch_index,
+        lexicon_file=lexicon,
     )
     logger.info(f"Writing to {output.name}.")
 
-    writer = csv.DictWriter(
-        output, fieldnames=["time", "word", "subject", "count"]
-    )
-    writer.writeheader()
-    for result in results:
-        writer.writerow(result)
+    if output_format == "parquet":
+        results.to_parquet(output, index=False)
+    else:
+        results.to_csv(output, index=False)
     logger.info(f"🖕 Wrote {len(results)} rows to {output.name}. 🖕")
 
 
 @main.command()
-@click.argument("data_file", type=str)
-@click.argument("config_file", type=click.File("r"))
+@click.argument("data_file", type=str, required=False)
+@click.argument("config_file", type=click.File("r"), required=False)
 @click.option(
     "--output-dir",
     type=str,
+    required=True,
     help="The output directory to render the site to.",
 )
-def build(data_file, config_file, output_dir):
+@click.option(
+    "--all",
+    "config_dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="Build a site for every JSON config in this directory instead of "
+    "DATA_FILE and CONFIG_FILE. Each site goes in a directory named after "
+    "its config under the output directory.",
+)
+@click.option(
+    "--data-dir",
+    type=click.Path(exists=True, file_okay=False),
+    default=".",
+    help="With --all, the directory containing a <config name>.csv data "
+    "file for each config. Default: current directory.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=None,
+    help="With --all, the number of processes to render with. "
+    "Default: number of CPUs.",
+)
+@click.option(
+    "--bundle",
+    is_flag=True,
+    help="Inline the styles, scripts and data into a self-contained page "
+    "and write .gz/.br copies of the page and data. Needs brotli. "
+    "Default: False.",
+)
+def build(
+    data_file, config_file, output_dir, config_dir, data_dir, workers, bundle
+):
     """
     Builds a site with a fancy interactive visualization.
 
+    Sites whose data, config and template haven't changed since they were
+    last built into the output directory are skipped.
+
     Arguments:\n
         DATA_FILE - The CSV file with the profanity. See README for schema.
         CONFIG_FILE - The JSON file with the site configuration.
     See README for schema.
     """
-    if not os.path.exists(output_dir):
-        logger.info(f"{output_dir} does not exist. Creating.")
-        sh.mkdir(output_dir)
-    if not os.path.exists(f"{output_dir}/js"):
-        sh.mkdir(f"{output_dir}/js")
-    sh.cp(data_file, output_dir)
-    with importlib_resources.path(
-        "profanity_power_index.resources", "profanity_power_index.js"
-    ) as js_path:
-        sh.cp(js_path, f"{output_dir}/js")
-
-    template = build_site(
-        json.load(config_file), f"{os.path.basename(data_file)}"
+    from profanity_power_index.build_site import (
+        build_sites,
+        write_script,
+        write_site,
     )
-    with open(f"{output_dir}/index.html", "w") as index_out:
-        index_out.write(template)
+
+    if bundle:
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            logger.error(
+                "❌ --bundle needs brotli: pip install -e .[bundle] ❌"
+            )
+            sys.exit(1)
+
+    if config_dir:
+        if data_file or config_file:
+            logger.error("❌ --all can't be used with DATA_FILE. ❌")
+            sys.exit(1)
+        built = build_sites(
+            config_dir, data_dir, output_dir, workers=workers, bundle=bundle
+        )
+        logger.info(
+            f"🖕 Built {sum(built.values())} of {len(built)} sites "
+            f"in {output_dir}. 🖕"
+        )
+        return
+
+    if not (data_file and config_file):
+        logger.error("❌ DATA_FILE and CONFIG_FILE are required. ❌")
+        sys.exit(1)
+
+    if bundle:
+        write_site(json.load(config_file), data_file, output_dir, bundle=True)
+    else:
+        script_name = write_script(os.path.join(output_dir, "js"))
+        write_site(
+            json.load(config_file), data_file, output_dir, f"js/{script_name}"
+        )
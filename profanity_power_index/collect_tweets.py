@@ -1,33 +1,33 @@
 import twitter
 
-from toolz import get_in, curry, thread_last, partition_all
+from queue import Queue, Full
+from threading import Thread
+from time import monotonic
+from toolz import (
+    get_in,
+    curry,
+    thread_last,
+    partition_all,
+    first,
+    compose,
+    identity,
+    concat,
+)
 from elasticsearch.helpers import bulk as es_bulk
 from loguru import logger
 
-TWEET_MAPPING = {
-    "mappings": {
-        "properties": {
-            "coordinates": {"type": "geo_point"},
-            "created_at": {
-                "type": "date",
-                "format": "EEE MMM dd HH:mm:ss Z yyyy",
-            },
-        }
-    }
-}
-
-
-PROFANITY = [
-    "fuck",
-    "shit",
-    "bitch",
-    "dick",
-    " ass ",
-    "asshole",
-    "asshat",
-    "jackass",
-    "dumbass",
-]
+from profanity_power_index.profanity_lexicon import (
+    load_lexicon,
+    profanity_matcher,
+    match_profanity,
+    track_pattern,
+)
+from profanity_power_index.timestamps import tweet_epoch_millis
+from profanity_power_index.tweet_index import (
+    create_tweet_index,
+    set_refresh_interval,
+    DEFAULT_REFRESH_INTERVAL,
+)
 
 
 def _extract_text(tweet):
@@ -40,57 +40,55 @@ def _extract_text(tweet):
         return tweet["text"]
 
 
-def _contains_profanity(tweet):
+def _match_profanity(matcher, tweet):
+    """Returns the tweet, its lowercased text and the profanity in it, so
+    everything downstream can reuse the matches.
+    """
     try:
         tweet_text = _extract_text(tweet).lower()
     except Exception:
-        return False
-    for profanity in PROFANITY:
-        if profanity in tweet_text:
-            return True
+        return tweet, "", []
+    return tweet, tweet_text, match_profanity(matcher, tweet_text)
+
+
+def _contains_profanity(matched_tweet):
+    return bool(matched_tweet[2])
 
-    return False
+
+def _observe_spikes(spike_detector, subject_patterns, matched_tweet):
+    tweet, tweet_text, profanity = matched_tweet
+    spike_detector.observe(
+        tweet_epoch_millis(tweet),
+        [
+            subject
+            for subject, pattern in subject_patterns
+            if pattern.match(tweet_text)
+        ],
+        profanity,
+    )
+    return matched_tweet
 
 
 def _tweet_to_bulk(index, tweet):
     return {
         "_index": index,
         "_id": tweet["id_str"],
+        # The tweet id is already the document _id, don't store it twice.
         "_source": {
-            "id": tweet["id_str"],
             "coordinates": get_in(["coordinates", "coordinates"], tweet, None),
             "text": _extract_text(tweet),
-            "created_at": tweet["created_at"],
+            "created_at": tweet_epoch_millis(tweet),
         },
     }
 
 
-def collect_tweets(
-    es_client,
+def _tweet_stream(
     track,
     twitter_consumer_key,
     twitter_consumer_secret,
     twitter_access_token_key,
     twitter_access_token_secret,
-    elasticsearch_index="profanity-power-index",
-    drop_index=False,
-    batch_size=10,
 ):
-
-    if es_client.indices.exists(elasticsearch_index):
-        logger.warning(f"Index {elasticsearch_index} exists.")
-        if drop_index:
-            logger.warning(f"Dropping {elasticsearch_index}.")
-            es_client.indices.delete(elasticsearch_index)
-            logger.info(f"Creating {elasticsearch_index}.")
-            es_client.indices.create(
-                index=elasticsearch_index, body=TWEET_MAPPING
-            )
-    else:
-        logger.info(f"Creating {elasticsearch_index}.")
-        es_client.indices.create(index=elasticsearch_index, body=TWEET_MAPPING)
-        logger.info(f"{elasticsearch_index} successfully created.")
-
     api = twitter.Api(
         consumer_key=twitter_consumer_key,
         consumer_secret=twitter_consumer_secret,
@@ -99,33 +97,217 @@ def collect_tweets(
     )
 
     logger.info(f"Connecting to twitter stream. Tracking {', '.join(track)}.")
-    tweet_stream = api.GetStreamFilter(track=track)
+    return api.GetStreamFilter(track=track)
+
+
+def _send_tweets(es_client, elasticsearch_index, tweet_doc_batches):
+    logger.info(f"Sending tweets to {elasticsearch_index}.")
+    failed = 0
+    succeeded = 0
+    logger.info(
+        f"{failed + succeeded} tweets processed for {elasticsearch_index}: "
+        f"{succeeded} succeeded, {failed} failed."
+    )
+    # Since the doc stream is partitioned we get the tweets in batches.
+    try:
+        for tweet_batch in tweet_doc_batches:
+            ok, fail = es_bulk(es_client, tweet_batch, stats_only=True)
+            succeeded += ok
+            failed += fail
+            if (failed + succeeded) % 100 == 0:
+                logger.info(
+                    f"{failed + succeeded} tweets processed for "
+                    f"{elasticsearch_index}: "
+                    f"{succeeded} succeeded, {failed} failed."
+                )
+    finally:
+        # Make everything collected so far searchable at the normal rate.
+        set_refresh_interval(
+            es_client, elasticsearch_index, DEFAULT_REFRESH_INTERVAL
+        )
+
+
+def collect_tweets(
+    es_client,
+    track,
+    twitter_consumer_key,
+    twitter_consumer_secret,
+    twitter_access_token_key,
+    twitter_access_token_secret,
+    elasticsearch_index="profanity-power-index",
+    drop_index=False,
+    batch_size=10,
+    refresh_interval="30s",
+    spike_detector=None,
+    lexicon_file=None,
+):
+
+    create_tweet_index(
+        es_client,
+        elasticsearch_index,
+        drop_index=drop_index,
+        refresh_interval=refresh_interval,
+    )
+
+    tweet_stream = _tweet_stream(
+        track,
+        twitter_consumer_key,
+        twitter_consumer_secret,
+        twitter_access_token_key,
+        twitter_access_token_secret,
+    )
 
+    match_tweet = curry(_match_profanity)(
+        profanity_matcher(load_lexicon(lexicon_file))
+    )
     tweet_to_bulk = curry(_tweet_to_bulk)(elasticsearch_index)
+    # Subjects are counted like extract's <subject>* queries, so the spike
+    # rates line up with the extracted data.
+    observe_spikes = (
+        curry(_observe_spikes)(
+            spike_detector,
+            [
+                (subject, track_pattern(subject, match="prefix"))
+                for subject in track
+            ],
+        )
+        if spike_detector
+        else identity
+    )
     tweet_doc_stream = thread_last(
         tweet_stream,
+        (map, match_tweet),
         # Filter out tweets that don't contain profanity.
         (filter, _contains_profanity),
+        # Count the matches towards the spike rates.
+        (map, observe_spikes),
         # Convert the tweets to a bulk-indexable document.
-        (map, tweet_to_bulk),
+        (map, compose(tweet_to_bulk, first)),
         # Partition for bulk writes.
         (partition_all, batch_size),
     )
 
-    logger.info(f"Sending tweets to {elasticsearch_index}.")
-    failed = 0
-    succeeded = 0
-    logger.info(
-        f"{failed + succeeded} tweets processed: "
-        f"{succeeded} succeeded, {failed} failed."
+    _send_tweets(es_client, elasticsearch_index, tweet_doc_stream)
+
+
+def _send_group_tweets(es_client, elasticsearch_index, batch_size, tweets):
+    _send_tweets(
+        es_client,
+        elasticsearch_index,
+        thread_last(
+            # The coordinator puts None on the queue when it shuts down.
+            iter(tweets.get, None),
+            (map, curry(_tweet_to_bulk)(elasticsearch_index)),
+            (partition_all, batch_size),
+        ),
     )
-    # Since the doc stream is partitioned we get the tweets in batches.
-    for tweet_batch in tweet_doc_stream:
-        ok, fail = es_bulk(es_client, tweet_batch, stats_only=True)
-        succeeded += ok
-        failed += fail
-        if (failed + succeeded) % 100 == 0:
-            logger.info(
-                f"{failed + succeeded} tweets processed: "
-                f"{succeeded} succeeded, {failed} failed."
-            )
+
+
+def collect_tweet_groups(
+    es_client,
+    track_groups,
+    twitter_consumer_key,
+    twitter_consumer_secret,
+    twitter_access_token_key,
+    twitter_access_token_secret,
+    drop_index=False,
+    batch_size=10,
+    refresh_interval="30s",
+    queue_size=1000,
+    lexicon_file=None,
+    shutdown_timeout=10.0,
+):
+    """Collects several groups of tracking terms from one Twitter stream.
+
+    track_groups maps an Elasticsearch index to the terms to collect into it.
+    Tweets are read and matched once, then handed to a bulk writer thread per
+    index through a queue of at most queue_size tweets. Tweets for a writer
+    whose queue is full are dropped immediately, so one slow index doesn't
+    stall the stream for the others.
+
+    On shutdown the writers get shutdown_timeout seconds to drain their
+    queues. Writers still stuck after that are abandoned.
+    """
+    for elasticsearch_index in track_groups:
+        create_tweet_index(
+            es_client,
+            elasticsearch_index,
+            drop_index=drop_index,
+            refresh_interval=refresh_interval,
+        )
+
+    tweet_stream = _tweet_stream(
+        sorted(set(concat(track_groups.values()))),
+        twitter_consumer_key,
+        twitter_consumer_secret,
+        twitter_access_token_key,
+        twitter_access_token_secret,
+    )
+
+    group_tracks = {
+        elasticsearch_index: [track_pattern(term) for term in track]
+        for elasticsearch_index, track in track_groups.items()
+    }
+    group_queues = {
+        elasticsearch_index: Queue(maxsize=queue_size)
+        for elasticsearch_index in track_groups
+    }
+    dropped = {elasticsearch_index: 0 for elasticsearch_index in track_groups}
+    group_writers = {
+        elasticsearch_index: Thread(
+            target=_send_group_tweets,
+            args=(es_client, elasticsearch_index, batch_size, tweets),
+            name=f"writer-{elasticsearch_index}",
+            daemon=True,
+        )
+        for elasticsearch_index, tweets in group_queues.items()
+    }
+    for group_writer in group_writers.values():
+        group_writer.start()
+
+    match_tweet = curry(_match_profanity)(
+        profanity_matcher(load_lexicon(lexicon_file))
+    )
+    matched_tweets = filter(
+        _contains_profanity, map(match_tweet, tweet_stream)
+    )
+    try:
+        for tweet, tweet_text, _ in matched_tweets:
+            for elasticsearch_index, track in group_tracks.items():
+                if not any(term.match(tweet_text) for term in track):
+                    continue
+                # A writer only stops if bulk writes raise, which would stop
+                # the single stream collector too.
+                if not group_writers[elasticsearch_index].is_alive():
+                    raise RuntimeError(
+                        f"Writer for {elasticsearch_index} stopped."
+                    )
+                try:
+                    group_queues[elasticsearch_index].put_nowait(tweet)
+                except Full:
+                    dropped[elasticsearch_index] += 1
+                    if dropped[elasticsearch_index] % 100 == 1:
+                        logger.warning(
+                            f"{elasticsearch_index} is falling behind. "
+                            f"{dropped[elasticsearch_index]} tweets dropped."
+                        )
+    finally:
+        logger.info("Stopping writers.")
+        shutdown_deadline = monotonic() + shutdown_timeout
+        for elasticsearch_index, group_writer in group_writers.items():
+            try:
+                if group_writer.is_alive():
+                    group_queues[elasticsearch_index].put(
+                        None,
+                        timeout=max(shutdown_deadline - monotonic(), 0),
+                    )
+                group_writer.join(max(shutdown_deadline - monotonic(), 0))
+            except Full:
+                pass
+            # The writers are daemon threads, so they don't hold up exit.
+            if group_writer.is_alive():
+                logger.warning(
+                    f"Writer for {elasticsearch_index} didn't stop. "
+                    f"{group_queues[elasticsearch_index].qsize()} tweets "
+                    "abandoned."
+                )
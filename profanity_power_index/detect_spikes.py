@@ -0,0 +1,143 @@
+import json
+import math
+
+from collections import deque
+from loguru import logger
+
+
+class _Rate:
+    """Sliding window count for one (subject, word) over the last
+    window_buckets buckets, plus an exponentially weighted mean and variance
+    of that count as the baseline.
+    """
+
+    def __init__(self, window_buckets):
+        self.buckets = deque([0] * window_buckets, maxlen=window_buckets)
+        self.current = 0
+        self.window_count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.buckets_seen = 0
+        self.spiking = False
+
+    def roll(self, alpha):
+        """Closes the current bucket. Returns the window count and its
+        z-score against the baseline from before this bucket.
+        """
+        # The deque is full, so appending drops the oldest bucket.
+        self.window_count += self.current - self.buckets[0]
+        self.buckets.append(self.current)
+        self.current = 0
+
+        # The standard deviation is floored at one tweet so a flat baseline
+        # doesn't turn every blip into an infinite z-score.
+        z_score = (self.window_count - self.mean) / max(
+            math.sqrt(self.variance), 1.0
+        )
+
+        difference = self.window_count - self.mean
+        increment = alpha * difference
+        self.mean += increment
+        self.variance = (1 - alpha) * (self.variance + difference * increment)
+        self.buckets_seen += 1
+        return self.window_count, z_score
+
+
+class SpikeDetector:
+    """Flags moments when profanity for a subject jumps well above its recent
+    rate, writing one JSON line per spike to spike_log.
+
+    Tweets are counted into bucket_seconds buckets. When a bucket closes, the
+    count over the last window_seconds is compared against an exponentially
+    weighted baseline (weight alpha per bucket). A spike starts when the
+    z-score reaches threshold and at least min_count tweets are in the window,
+    and is only reported again after it drops back below threshold.
+
+    Each tweet costs O(1) per (subject, word) it matches, and memory is
+    bounded by the number of (subject, word) pairs.
+    """
+
+    def __init__(
+        self,
+        spike_log,
+        bucket_seconds=10,
+        window_seconds=60,
+        alpha=0.05,
+        threshold=3.0,
+        min_count=5,
+    ):
+        if window_seconds < bucket_seconds or window_seconds % bucket_seconds:
+            raise ValueError(
+                f"Window ({window_seconds}s) must be a whole number of "
+                f"buckets ({bucket_seconds}s)."
+            )
+        self.spike_log = spike_log
+        self.bucket_millis = bucket_seconds * 1000
+        self.window_buckets = window_seconds // bucket_seconds
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_count = min_count
+        # Don't trust the baseline until it's seen a couple of windows.
+        self.warmup_buckets = 2 * self.window_buckets
+        self.rates = {}
+        self.current_bucket = None
+
+    def observe(self, timestamp_millis, subjects, words):
+        bucket = timestamp_millis // self.bucket_millis
+        if self.current_bucket is None:
+            self.current_bucket = bucket
+        # Late tweets are counted in the current bucket.
+        while bucket > self.current_bucket:
+            self._roll()
+            # After a long gap the windows are all zero and the baseline has
+            # decayed; no point rolling through every empty bucket.
+            if bucket - self.current_bucket > 10 * self.warmup_buckets:
+                self.current_bucket = bucket - 10 * self.warmup_buckets
+
+        for subject in subjects:
+            for word in words:
+                key = (subject, word)
+                if key not in self.rates:
+                    self.rates[key] = _Rate(self.window_buckets)
+                self.rates[key].current += 1
+
+    def _roll(self):
+        bucket_end = (self.current_bucket + 1) * self.bucket_millis
+        for (subject, word), rate in self.rates.items():
+            window_count, z_score = rate.roll(self.alpha)
+            is_spike = (
+                rate.buckets_seen > self.warmup_buckets
+                and window_count >= self.min_count
+                and z_score >= self.threshold
+            )
+            if is_spike and not rate.spiking:
+                self._write_spike(
+                    bucket_end, subject, word, window_count, rate, z_score
+                )
+            rate.spiking = is_spike
+        self.current_bucket += 1
+
+    def _write_spike(
+        self, bucket_end, subject, word, window_count, rate, z_score
+    ):
+        logger.info(
+            f"🚨 {subject} / {word} spiked to {window_count} tweets "
+            f"(z-score {z_score:.1f}). 🚨"
+        )
+        self.spike_log.write(
+            json.dumps(
+                {
+                    "time": bucket_end,
+                    "subject": subject,
+                    "word": word,
+                    "count": window_count,
+                    "window_seconds": self.window_buckets
+                    * self.bucket_millis
+                    // 1000,
+                    "baseline": round(rate.mean, 2),
+                    "z_score": round(z_score, 2),
+                }
+            )
+            + "\n"
+        )
+        self.spike_log.flush()
@@ -1,15 +1,13 @@
-from toolz import assoc, assoc_in, thread_first, get_in
-from itertools import product
-from loguru import logger
+import numpy as np
+import pandas as pd
 
+from toolz import assoc, assoc_in, thread_first
+from loguru import logger
 
-PROFANITY_MAPPING = {
-    "fuck": "text:*fuck*",
-    "shit": "text:*shit*",
-    "bitch": "text:bitch*",
-    "ass": "text:ass*",
-    "dick": "text:*dick*",
-}
+from profanity_power_index.profanity_lexicon import (
+    load_lexicon,
+    profanity_queries,
+)
 
 
 tweets_per_minute = {
@@ -17,7 +15,7 @@ tweets_per_minute = {
         "date_histogram": {
             "field": "created_at",
             "interval": "minute",
-            "format": "date_time_no_millis",
+            "format": "epoch_millis",
         }
     }
 }
@@ -42,9 +40,7 @@ def time_range(start, end):
             "created_at": {
                 "gte": start,
                 "lte": end,
-                # Yes this is literally date_time_no_millis in the docs.
-                # no, date_time_no_millis does not work.
-                "format": "yyyy-MM-dd'T'HH:mm:ssZZ"
+                "format": "epoch_millis",
             }
         }
     }
@@ -90,46 +86,83 @@ def elasticsearch_query(start, end, targets, profanity_mapping):
     )
 
 
+def marshal_results(time_buckets, words, targets):
+    """Flattens the aggregation buckets into a frame with a row for every
+    time, word and target (in that order), zero filled.
+    """
+    # Duplicate targets collapse into one filter bucket anyway.
+    targets = list(dict.fromkeys(targets))
+    word_index = {word: index for index, word in enumerate(words)}
+    target_index = {target: index for index, target in enumerate(targets)}
+
+    # One pass over the buckets, only visiting the ones with tweets in them.
+    times = np.empty(len(time_buckets), dtype=np.int64)
+    cells = []
+    counts = []
+    for bucket_index, time_bucket in enumerate(time_buckets):
+        times[bucket_index] = time_bucket["key"]
+        if not time_bucket["doc_count"]:
+            continue
+        profanity_buckets = time_bucket["profanity"]["buckets"]
+        for word, profanity_bucket in profanity_buckets.items():
+            if not profanity_bucket["doc_count"]:
+                continue
+            target_buckets = profanity_bucket["target"]["buckets"]
+            for target, target_bucket in target_buckets.items():
+                if target_bucket["doc_count"]:
+                    cells.append(
+                        (bucket_index * len(words) + word_index[word])
+                        * len(targets)
+                        + target_index[target]
+                    )
+                    counts.append(target_bucket["doc_count"])
+
+    count_grid = np.zeros(
+        len(time_buckets) * len(words) * len(targets), dtype=np.int64
+    )
+    count_grid[np.array(cells, dtype=np.int64)] = counts
+
+    cells_per_time = len(words) * len(targets)
+    return pd.DataFrame(
+        {
+            "time": np.repeat(times, cells_per_time),
+            "word": pd.Categorical.from_codes(
+                np.tile(
+                    np.repeat(np.arange(len(words)), len(targets)),
+                    len(time_buckets),
+                ),
+                categories=words,
+            ),
+            "subject": pd.Categorical.from_codes(
+                np.tile(
+                    np.arange(len(targets)), len(time_buckets) * len(words)
+                ),
+                categories=targets,
+            ),
+            "count": count_grid,
+        }
+    )
+
+
 def extract_profanity(
     es_connection,
     start,
     end,
     targets,
     elasticsearch_index="profanity-power-index",
+    lexicon_file=None,
 ):
 
-    es_query = elasticsearch_query(start, end, targets, PROFANITY_MAPPING)
+    profanity_mapping = profanity_queries(load_lexicon(lexicon_file))
+    es_query = elasticsearch_query(start, end, targets, profanity_mapping)
 
     logger.info("Calling elasticsearch.")
     results = es_connection.search(index=elasticsearch_index, body=es_query)
     logger.info(f"Done. Hit count: {results['hits']['total']}")
 
     logger.info("Marshalling elasticsearch results.")
-    marshalled_results = []
-    time_profanity_target = product(
+    return marshal_results(
         results["aggregations"]["tweets_per_minute"]["buckets"],
-        PROFANITY_MAPPING.keys(),
+        list(profanity_mapping.keys()),
         targets,
     )
-    for time_bucket, profanity, target in time_profanity_target:
-        marshalled_results.append(
-            {
-                "time": time_bucket["key_as_string"],
-                "word": profanity,
-                "subject": target,
-                "count": get_in(
-                    [
-                        "profanity",
-                        "buckets",
-                        profanity,
-                        "target",
-                        "buckets",
-                        target,
-                        "doc_count",
-                    ],
-                    time_bucket,
-                    0,
-                ),
-            }
-        )
-    return marshalled_results
@@ -0,0 +1,124 @@
+import importlib_resources
+import json
+import re
+
+from functools import lru_cache
+
+LEXICON_NAME = "profanity_lexicon.json"
+
+# How a lexicon term has to line up with a word (an Elasticsearch token) in
+# the tweet. Prefix matches double as stemming: "bitch" covers "bitches" and
+# "bitching".
+MATCH_TYPES = ["anywhere", "prefix", "suffix", "word"]
+
+# The standard analyzer splits words the way Unicode (UAX #29) does, which
+# keeps apostrophes, periods and colons between two letters inside the word:
+# "ass's" and "dumb.ass" are each one token, so neither is the word "ass".
+# Scripts that aren't written with spaces (Chinese, Japanese, Thai) are split
+# differently, and the regexes don't try to follow that.
+_MID_LETTER = "[.:'\u2019]"
+_LETTER = r"[^\W\d_]"
+_WORD_START = rf"(?<!\w)(?<!{_LETTER}{_MID_LETTER})"
+_WORD_END = rf"(?!\w|{_MID_LETTER}{_LETTER})"
+# Possessives stay on the token too, so whole word and suffix matches also
+# match them ("jackass's").
+_POSSESSIVE = "'s"
+
+
+@lru_cache(maxsize=None)
+def load_lexicon(lexicon_file=None):
+    """Loads and validates the profanity lexicon, a JSON object mapping each
+    word to the variants that count as that word:
+
+        {"ass": [{"term": "ass", "match": "word"},
+                 {"term": "jackass", "match": "suffix"}]}
+
+    Defaults to the lexicon that ships with the package.
+    """
+    if lexicon_file is None:
+        lexicon = json.loads(
+            importlib_resources.files("profanity_power_index.resources")
+            .joinpath(LEXICON_NAME)
+            .read_text()
+        )
+    else:
+        with open(lexicon_file, "r") as lexicon_in:
+            lexicon = json.load(lexicon_in)
+
+    for word, variants in lexicon.items():
+        if not variants:
+            raise ValueError(f"{word} has no variants.")
+        for variant in variants:
+            # Terms go straight into query strings and regexes.
+            if not re.fullmatch(r"\w+", variant["term"]):
+                raise ValueError(
+                    f"{variant['term']} for {word} must be a single word."
+                )
+            if variant["match"] not in MATCH_TYPES:
+                raise ValueError(
+                    f"{variant['match']} for {variant['term']} must be one "
+                    f"of {', '.join(MATCH_TYPES)}."
+                )
+    return lexicon
+
+
+def _variant_query(variant):
+    term = variant["term"].lower()
+    return {
+        "anywhere": f"text:*{term}*",
+        "prefix": f"text:{term}*",
+        "suffix": f"text:*{term} OR text:*{term}{_POSSESSIVE}",
+        "word": f"text:{term} OR text:{term}{_POSSESSIVE}",
+    }[variant["match"]]
+
+
+def _variant_pattern(variant):
+    term = re.escape(variant["term"].lower())
+    return {
+        "anywhere": term,
+        "prefix": f"{_WORD_START}{term}",
+        "suffix": f"{term}(?:{_POSSESSIVE})?{_WORD_END}",
+        "word": f"{_WORD_START}{term}(?:{_POSSESSIVE})?{_WORD_END}",
+    }[variant["match"]]
+
+
+def profanity_queries(lexicon):
+    """Compiles the lexicon into an Elasticsearch query string per word."""
+    return {
+        word: " OR ".join(_variant_query(variant) for variant in variants)
+        for word, variants in lexicon.items()
+    }
+
+
+def profanity_matcher(lexicon):
+    """Compiles the lexicon into a regex per word that matches lowercased
+    tweet text the same way profanity_queries matches the indexed text.
+    """
+    return [
+        (
+            word,
+            re.compile(
+                "|".join(_variant_pattern(variant) for variant in variants)
+            ),
+        )
+        for word, variants in lexicon.items()
+    ]
+
+
+def match_profanity(matcher, text):
+    return [word for word, pattern in matcher if pattern.search(text)]
+
+
+def track_pattern(track_term, match="word"):
+    """Compiles a tracking term into a regex that matches lowercased text
+    containing every word of the term, in any order, the way the Twitter
+    stream's track filter does. The words line up with the text like lexicon
+    variants of the given match type. Use it with pattern.match.
+    """
+    return re.compile(
+        "".join(
+            f"(?=.*{_variant_pattern({'term': word, 'match': match})})"
+            for word in track_term.lower().split()
+        ),
+        re.DOTALL,
+    )
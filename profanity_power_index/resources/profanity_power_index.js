@@ -396,8 +396,10 @@ function csvCallback(subjects, start, stop) {
     var cb = function(data) {
         
         var cleanedData = data.map(function(x) {
-            // Convert date type and truncate to minute.
-            var newTime = new Date(x.time);
+            // Convert date type and truncate to minute. Times are epoch
+            // millis, older extracts used ISO strings.
+            var newTime = /^\d+$/.test(x.time) ? new Date(+x.time)
+                                               : new Date(x.time);
             newTime.setSeconds(0);
             newTime.setMilliseconds(0);
 
@@ -0,0 +1,40 @@
+from datetime import datetime
+from functools import lru_cache
+from dateutil import tz
+from loguru import logger
+
+# Twitter's created_at format, e.g. "Wed Oct 10 20:19:24 +0000 2018".
+TWITTER_TIME_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+QUERY_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def datetime_to_epoch_millis(dt):
+    return round(dt.timestamp() * 1000)
+
+
+# Tweets arrive roughly in order, so lots of them share a created_at string.
+@lru_cache(maxsize=1024)
+def twitter_time_to_epoch_millis(created_at):
+    return datetime_to_epoch_millis(
+        datetime.strptime(created_at, TWITTER_TIME_FORMAT)
+    )
+
+
+def tweet_epoch_millis(tweet):
+    # The streaming API already sends the creation time as epoch millis.
+    if "timestamp_ms" in tweet:
+        return int(tweet["timestamp_ms"])
+    return twitter_time_to_epoch_millis(tweet["created_at"])
+
+
+def query_time_to_epoch_millis(query_time):
+    try:
+        query_datetime = datetime.strptime(
+            query_time, f"{QUERY_TIME_FORMAT}%z"
+        )
+    except ValueError:
+        logger.info(f"Adding local time zone to {query_time}.")
+        query_datetime = datetime.strptime(
+            query_time, QUERY_TIME_FORMAT
+        ).replace(tzinfo=tz.gettz())
+    return datetime_to_epoch_millis(query_datetime)
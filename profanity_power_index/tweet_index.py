@@ -0,0 +1,145 @@
+from loguru import logger
+from toolz import get_in
+
+# Twitter's created_at format, e.g. "Wed Oct 10 20:19:24 +0000 2018".
+CREATED_AT_FORMAT = "EEE MMM dd HH:mm:ss Z yyyy"
+
+# Refresh interval applied once a bulk collection or reindex finishes.
+DEFAULT_REFRESH_INTERVAL = "1s"
+
+# What Elasticsearch uses for a date field without a format.
+DEFAULT_DATE_FORMAT = "strict_date_optional_time||epoch_millis"
+
+TWEET_MAPPING = {
+    "settings": {
+        "index": {
+            "codec": "best_compression",
+            "refresh_interval": DEFAULT_REFRESH_INTERVAL,
+        }
+    },
+    "mappings": {
+        # Anything outside the declared fields stays in _source but doesn't
+        # get indexed.
+        "dynamic": False,
+        "properties": {
+            "coordinates": {"type": "geo_point"},
+            # Collected as epoch millis. The Twitter format is still accepted
+            # so older indices can be reindexed.
+            "created_at": {
+                "type": "date",
+                "format": f"epoch_millis||{CREATED_AT_FORMAT}",
+            },
+            # Only ever queried with query_string against the analyzed field.
+            # No keyword subfield, and no norms because we only count hits.
+            "text": {"type": "text", "norms": False},
+        },
+    },
+}
+
+
+def tweet_index_body(refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    return {
+        "settings": {
+            "index": {
+                **TWEET_MAPPING["settings"]["index"],
+                "refresh_interval": refresh_interval,
+            }
+        },
+        "mappings": TWEET_MAPPING["mappings"],
+    }
+
+
+def set_refresh_interval(es_client, index, refresh_interval):
+    logger.info(f"Setting refresh interval for {index} to {refresh_interval}.")
+    es_client.indices.put_settings(
+        index=index, body={"index": {"refresh_interval": refresh_interval}}
+    )
+
+
+def _created_at_formats(es_client, index):
+    formats = []
+    for index_mapping in es_client.indices.get_mapping(index=index).values():
+        mappings = index_mapping["mappings"]
+        # Elasticsearch 6 nests the properties under the mapping type.
+        for type_mapping in (
+            [mappings] if "properties" in mappings else mappings.values()
+        ):
+            created_at = get_in(["properties", "created_at"], type_mapping)
+            if created_at is not None:
+                formats.extend(
+                    created_at.get("format", DEFAULT_DATE_FORMAT).split("||")
+                )
+    return formats
+
+
+def _check_tweet_index(es_client, index):
+    """Raises ValueError if index can't take created_at as epoch millis, which
+    is the case for indices made before the collector switched to them.
+    """
+    formats = _created_at_formats(es_client, index)
+    if formats and "epoch_millis" not in formats:
+        raise ValueError(
+            f"{index} stores created_at as Twitter timestamps. "
+            f"Reindex it (profanity-power-index reindex {index} <new index>) "
+            "and collect into the new index, or drop it."
+        )
+
+
+def create_tweet_index(
+    es_client,
+    index,
+    drop_index=False,
+    refresh_interval=DEFAULT_REFRESH_INTERVAL,
+):
+    if es_client.indices.exists(index):
+        logger.warning(f"Index {index} exists.")
+        if not drop_index:
+            _check_tweet_index(es_client, index)
+            set_refresh_interval(es_client, index, refresh_interval)
+            return
+        logger.warning(f"Dropping {index}.")
+        es_client.indices.delete(index)
+
+    logger.info(f"Creating {index}.")
+    es_client.indices.create(
+        index=index, body=tweet_index_body(refresh_interval)
+    )
+    logger.info(f"{index} successfully created.")
+
+
+def reindex_tweets(
+    es_client,
+    source_index,
+    dest_index,
+    drop_index=False,
+    refresh_interval="-1",
+):
+    create_tweet_index(
+        es_client,
+        dest_index,
+        drop_index=drop_index,
+        refresh_interval=refresh_interval,
+    )
+
+    logger.info(f"Reindexing {source_index} into {dest_index}.")
+    try:
+        response = es_client.reindex(
+            body={
+                "source": {
+                    "index": source_index,
+                    "_source": ["coordinates", "created_at", "text"],
+                },
+                "dest": {"index": dest_index},
+            },
+            wait_for_completion=True,
+            request_timeout=3600,
+        )
+    finally:
+        set_refresh_interval(es_client, dest_index, DEFAULT_REFRESH_INTERVAL)
+
+    logger.info(
+        f"Reindexed {response['created'] + response['updated']} of "
+        f"{response['total']} tweets with {len(response['failures'])} "
+        "failures."
+    )
+    return response
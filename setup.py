@@ -5,7 +5,17 @@ setup(
     name="profanity-power-index",
     url="https://github.com/timothyrenner/profanity-power-index",
     packages=find_packages(exclude=["site_configs", "data"]),
+    package_data={
+        "profanity_power_index.resources": [
+            "*.js",
+            "*.jinja",
+            "*.json",
+            "vendor/*",
+        ]
+    },
     license="MIT",
+    # pandas 1.2 (for writing to binary file handles) needs 3.7.1.
+    python_requires=">=3.7.1",
     install_requires=[
         "click",
         "toolz",
@@ -14,9 +24,11 @@ setup(
         "python-dotenv",
         "python-twitter",
         "jinja2",
-        "sh",
-        "importlib_resources",
+        "importlib_resources>=1.1",
+        "numpy",
+        "pandas>=1.2",
     ],
+    extras_require={"bundle": ["brotli"], "parquet": ["pyarrow"]},
     entry_points={
         "console_scripts": [
             "profanity-power-index=profanity_power_index.cli:main"
@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import sys
+import pytest
+
+from click.testing import CliRunner
+
+from profanity_power_index import build_site
+from profanity_power_index.build_site import _vendor_asset, write_site
+from profanity_power_index.cli import main
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SITE_CONFIG = os.path.join(
+    REPO_ROOT, "site_configs", "20201022_presidential_debate.json"
+)
+COMPRESSED_FILES = [
+    "index.html.gz",
+    "index.html.br",
+    "profanity.csv.gz",
+    "profanity.csv.br",
+]
+
+
+def _write_site(tmp_path, bundle):
+    data_file = tmp_path / "profanity.csv"
+    data_file.write_text(
+        "time,word,subject,count\n"
+        "1603418400000,fuck,trump,3\n"
+        "1603418400000,fuck,biden,1\n"
+    )
+    with open(SITE_CONFIG, "r") as config_in:
+        site_config = json.load(config_in)
+    output_dir = tmp_path / "site"
+    built = write_site(
+        site_config,
+        str(data_file),
+        str(output_dir),
+        script_location=None if bundle else "js/profanity_power_index.js",
+        bundle=bundle,
+    )
+    return built, output_dir
+
+
+def _write_bundle(tmp_path):
+    return _write_site(tmp_path, bundle=True)
+
+
+def test_bundle_is_self_contained(tmp_path):
+    built, output_dir = _write_bundle(tmp_path)
+    index = (output_dir / "index.html").read_text()
+
+    assert built
+    assert not re.search(r"<script[^>]*\bsrc=", index)
+    assert not re.search(r"<link[^>]*stylesheet", index)
+    assert "Bootstrap v3.3.5" in index
+    assert "1603418400000,fuck,trump,3" in index
+    # The inlined assets can't close their tags early.
+    assert index.count("</script>") == 2
+    assert index.count("</style>") == 1
+
+
+def test_bundle_writes_compressed_copies(tmp_path):
+    _, output_dir = _write_bundle(tmp_path)
+
+    for compressed in COMPRESSED_FILES:
+        assert (output_dir / compressed).exists()
+
+
+def test_unbundled_rebuild_removes_compressed_copies(tmp_path):
+    _write_bundle(tmp_path)
+    built, output_dir = _write_site(tmp_path, bundle=False)
+
+    assert built
+    for compressed in COMPRESSED_FILES:
+        assert not (output_dir / compressed).exists()
+
+
+def test_unchanged_bundle_is_skipped(tmp_path):
+    _write_bundle(tmp_path)
+    built, _ = _write_bundle(tmp_path)
+
+    assert not built
+
+
+@pytest.mark.parametrize(
+    "deleted", ["index.html", "profanity.csv", "index.html.br"]
+)
+def test_deleted_output_is_rebuilt(tmp_path, deleted):
+    _, output_dir = _write_bundle(tmp_path)
+    (output_dir / deleted).unlink()
+    built, _ = _write_bundle(tmp_path)
+
+    assert built
+    assert (output_dir / deleted).exists()
+
+
+def test_vendored_d3_matches_cdn():
+    # d3js.org/d3.v3.min.js, which unbundled pages load, is the last 3.x.
+    assert 'version:"3.5.17"' in _vendor_asset("d3.v3.min.js")
+
+
+def test_bundle_needs_brotli(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_site, "brotli", None)
+
+    with pytest.raises(ImportError):
+        _write_bundle(tmp_path)
+    assert not (tmp_path / "site").exists()
+
+
+def test_cli_bundle_needs_brotli(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "brotli", None)
+    result = CliRunner().invoke(
+        main,
+        [
+            "build",
+            "--all",
+            os.path.join(REPO_ROOT, "site_configs"),
+            "--output-dir",
+            str(tmp_path / "sites"),
+            "--bundle",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert not (tmp_path / "sites").exists()
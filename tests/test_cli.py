@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the subcommands that need these should import them.
+HEAVY_MODULES = [
+    "elasticsearch",
+    "twitter",
+    "jinja2",
+    "palettable",
+    "dotenv",
+    "numpy",
+    "pandas",
+]
+
+
+def _run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def _loaded_modules(code):
+    result = _run_python(
+        "-c", f"{code}\nimport sys\nprint('\\n'.join(sys.modules))"
+    )
+    return {module.split(".")[0] for module in result.stdout.split()}
+
+
+def test_cli_import_skips_heavy_modules():
+    loaded = _loaded_modules("import profanity_power_index.cli")
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_cli_help_skips_heavy_modules():
+    loaded = _loaded_modules(
+        "from profanity_power_index.cli import main\n"
+        "main(['--help'], standalone_mode=False)"
+    )
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_cli_import_time():
+    result = _run_python(
+        "-X", "importtime", "-c", "import profanity_power_index.cli"
+    )
+    # Lines look like "import time: self [us] | cumulative | imported package"
+    cumulative_us = {
+        line.split("|")[2].strip(): int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+        and "cumulative" not in line
+    }
+    # Generous, the heavy modules alone take most of a second to import.
+    assert cumulative_us["profanity_power_index.cli"] < 500_000
@@ -0,0 +1,164 @@
+import threading
+import time
+
+from profanity_power_index import collect_tweets
+
+
+def _tweets(texts):
+    for tweet_id, text in enumerate(texts):
+        yield {
+            "id_str": str(tweet_id),
+            "text": text,
+            "timestamp_ms": "1603411200000",
+        }
+
+
+def _debate_tweets(count):
+    return _tweets(
+        f"{'trump' if tweet_id % 2 else 'biden'} is full of shit"
+        for tweet_id in range(count)
+    )
+
+
+def _collect(monkeypatch, tweets, track_groups, stalled_index=None, **options):
+    """Runs collect_tweet_groups over tweets with stalled_index's bulk writes
+    stuck until the returned event is set. Returns the ids written to each
+    index, the release event and how long collection took.
+    """
+    written = {elasticsearch_index: [] for elasticsearch_index in track_groups}
+    release = threading.Event()
+
+    def fake_bulk(es_client, actions, stats_only):
+        actions = list(actions)
+        if actions[0]["_index"] == stalled_index:
+            release.wait()
+        else:
+            written[actions[0]["_index"]].extend(
+                action["_id"] for action in actions
+            )
+        return len(actions), 0
+
+    monkeypatch.setattr(
+        collect_tweets, "create_tweet_index", lambda *args, **kwargs: None
+    )
+    monkeypatch.setattr(
+        collect_tweets, "set_refresh_interval", lambda *args: None
+    )
+    monkeypatch.setattr(collect_tweets, "es_bulk", fake_bulk)
+    monkeypatch.setattr(collect_tweets, "_tweet_stream", lambda *args: tweets)
+
+    start = time.monotonic()
+    collect_tweets.collect_tweet_groups(
+        None,
+        track_groups,
+        "key",
+        "secret",
+        "token",
+        "token_secret",
+        batch_size=1,
+        **options,
+    )
+    return written, release, time.monotonic() - start
+
+
+def _collect_with_stalled_index(monkeypatch, tweet_count, **options):
+    written, release, elapsed = _collect(
+        monkeypatch,
+        _debate_tweets(tweet_count),
+        {"trump": ["Trump"], "biden": ["Biden"]},
+        stalled_index="biden",
+        **options,
+    )
+    return written["trump"], release, elapsed
+
+
+def _release(release):
+    # Let an abandoned writer that did get the shutdown sentinel finish
+    # before the fakes are undone. One that didn't just waits on its queue.
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name.startswith("writer-"):
+            thread.join(timeout=1)
+
+
+def test_slow_group_doesnt_stall_the_others(monkeypatch):
+    written, release, elapsed = _collect_with_stalled_index(
+        monkeypatch, 4000, queue_size=1000, shutdown_timeout=0.5
+    )
+    _release(release)
+
+    # Every trump tweet fits in its queue. Half the biden tweets don't and are
+    # dropped without waiting, so only the shutdown waits on the stuck writer.
+    assert sorted(written, key=int) == [str(i) for i in range(1, 4000, 2)]
+    assert elapsed < 5
+
+
+def test_shutdown_abandons_stuck_writer(monkeypatch):
+    written, release, elapsed = _collect_with_stalled_index(
+        monkeypatch, 40, queue_size=100, shutdown_timeout=0.5
+    )
+    _release(release)
+
+    assert len(written) == 20
+    assert elapsed < 5
+
+
+def test_multi_word_terms_match_words_anywhere(monkeypatch):
+    written, _, _ = _collect(
+        monkeypatch,
+        _tweets(
+            [
+                "Ryan, Tim is full of shit",
+                "tim ryan is full of shit",
+                "tim is full of shit",
+                "timothy ryan is full of shit",
+                "trump and tim ryan are full of shit",
+            ]
+        ),
+        {"ryan": ["Tim Ryan"], "trump": ["Trump"]},
+    )
+
+    assert written == {"ryan": ["0", "1", "4"], "trump": ["4"]}
+
+
+class _RecordingDetector:
+    def __init__(self):
+        self.subjects = []
+
+    def observe(self, timestamp_millis, subjects, words):
+        self.subjects.append(subjects)
+
+
+def test_spike_subjects_match_like_extract(monkeypatch):
+    monkeypatch.setattr(
+        collect_tweets, "create_tweet_index", lambda *args, **kwargs: None
+    )
+    monkeypatch.setattr(
+        collect_tweets,
+        "_tweet_stream",
+        lambda *args: _tweets(
+            [
+                "trump is full of shit",
+                "antitrump shit",
+                "trumpism is shit",
+                "@realdonaldtrump shit",
+                "#Trump2020 shit",
+            ]
+        ),
+    )
+    # Drains the stream through the spike detector without writing it.
+    monkeypatch.setattr(
+        collect_tweets, "_send_tweets", lambda *args: list(args[2])
+    )
+    spike_detector = _RecordingDetector()
+    collect_tweets.collect_tweets(
+        None,
+        ["Trump"],
+        "key",
+        "secret",
+        "token",
+        "token_secret",
+        spike_detector=spike_detector,
+    )
+
+    assert spike_detector.subjects == [["Trump"], [], ["Trump"], [], ["Trump"]]
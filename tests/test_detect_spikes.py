@@ -0,0 +1,43 @@
+import io
+import json
+import random
+import pytest
+
+from click.testing import CliRunner
+
+from profanity_power_index.cli import main
+from profanity_power_index.detect_spikes import SpikeDetector
+
+
+def test_spike_is_reported_once():
+    spike_log = io.StringIO()
+    spike_detector = SpikeDetector(spike_log)
+    random.seed(0)
+    for second in range(1800):
+        # A steady trickle with one minute of bursting.
+        tweets = 8 if 1200 <= second < 1260 else random.randint(0, 2)
+        for _ in range(tweets):
+            spike_detector.observe(second * 1000, ["trump"], ["fuck"])
+    spike_detector.observe(1830 * 1000, [], [])
+
+    spikes = [json.loads(line) for line in spike_log.getvalue().splitlines()]
+    assert len(spikes) == 1
+    assert spikes[0]["subject"] == "trump"
+    assert spikes[0]["word"] == "fuck"
+    assert 1200 * 1000 <= spikes[0]["time"] <= 1260 * 1000
+
+
+def test_window_must_be_whole_buckets():
+    with pytest.raises(ValueError):
+        SpikeDetector(io.StringIO(), bucket_seconds=10, window_seconds=25)
+
+
+@pytest.mark.parametrize("spike_window", ["5", "25"])
+def test_cli_rejects_bad_spike_window(spike_window):
+    result = CliRunner().invoke(
+        main,
+        ["collect", "-t", "trump", "--spike-window", spike_window],
+    )
+
+    assert result.exit_code == 2
+    assert "--spike-window" in result.output
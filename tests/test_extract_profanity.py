@@ -0,0 +1,94 @@
+import random
+
+from itertools import product
+from toolz import get_in
+
+from profanity_power_index.extract_profanity import marshal_results
+
+WORDS = ["fuck", "shit", "bitch", "ass", "dick"]
+TARGETS = ["trump", "biden", "pence"]
+
+
+def _time_buckets(minutes, seed=0):
+    """Tweets per minute buckets shaped like the Elasticsearch response.
+    Zero count buckets are sometimes left out, like Elasticsearch does for
+    empty nested aggregations.
+    """
+    random.seed(seed)
+    time_buckets = []
+    for minute in range(minutes):
+        profanity_buckets = {}
+        for word in WORDS:
+            target_buckets = {
+                target: {"doc_count": random.choice([0, 0, 1, 7])}
+                for target in TARGETS
+                if random.random() < 0.9
+            }
+            profanity_buckets[word] = {
+                "doc_count": sum(
+                    bucket["doc_count"] for bucket in target_buckets.values()
+                ),
+                "target": {"buckets": target_buckets},
+            }
+        doc_count = sum(
+            bucket["doc_count"] for bucket in profanity_buckets.values()
+        )
+        time_bucket = {"key": 1603411200000 + minute * 60000}
+        time_bucket["doc_count"] = doc_count
+        if doc_count or minute % 2:
+            time_bucket["profanity"] = {"buckets": profanity_buckets}
+        time_buckets.append(time_bucket)
+    return time_buckets
+
+
+def _loop_marshal_results(time_buckets, words, targets):
+    # The row by row loop extract used before marshal_results.
+    return [
+        {
+            "time": time_bucket["key"],
+            "word": profanity,
+            "subject": target,
+            "count": get_in(
+                [
+                    "profanity",
+                    "buckets",
+                    profanity,
+                    "target",
+                    "buckets",
+                    target,
+                    "doc_count",
+                ],
+                time_bucket,
+                0,
+            ),
+        }
+        for time_bucket, profanity, target in product(
+            time_buckets, words, targets
+        )
+    ]
+
+
+def test_marshal_results_matches_loop():
+    time_buckets = _time_buckets(120)
+    results = marshal_results(time_buckets, WORDS, TARGETS)
+
+    expected = _loop_marshal_results(time_buckets, WORDS, TARGETS)
+    assert len(results) == len(expected)
+    assert results.astype({"word": str, "subject": str}).to_dict(
+        "records"
+    ) == expected
+    assert results["count"].sum() > 0
+
+
+def test_marshal_results_without_buckets():
+    results = marshal_results([], WORDS, TARGETS)
+
+    assert list(results.columns) == ["time", "word", "subject", "count"]
+    assert results.empty
+
+
+def test_marshal_results_collapses_duplicate_targets():
+    time_buckets = _time_buckets(3)
+    results = marshal_results(time_buckets, WORDS, TARGETS + ["trump"])
+
+    assert results.equals(marshal_results(time_buckets, WORDS, TARGETS))
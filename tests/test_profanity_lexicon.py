@@ -0,0 +1,83 @@
+import re
+import pytest
+
+from fnmatch import fnmatchcase
+
+from profanity_power_index.profanity_lexicon import (
+    load_lexicon,
+    profanity_matcher,
+    profanity_queries,
+    match_profanity,
+)
+
+# Tweets the collector has to agree with extract on, one per line with the
+# words that should count.
+CORPUS = [
+    ("you're full of shit", ["shit"]),
+    ("bullshit", ["shit"]),
+    ("shitty", ["shit"]),
+    ("what the FUCK", ["fuck"]),
+    ("motherfuckers", ["fuck"]),
+    ("son of a bitch", ["bitch"]),
+    ("bitches be bitching", ["bitch"]),
+    ("bitch's", ["bitch"]),
+    ("sonofabitch", []),
+    ("kiss my ass", ["ass"]),
+    ("ass's", ["ass"]),
+    ("asses", ["ass"]),
+    ("asshole", ["ass"]),
+    ("assholes", ["ass"]),
+    ("asshats", ["ass"]),
+    ("jackass", ["ass"]),
+    ("jackass's", ["ass"]),
+    ("what a dumbass.", ["ass"]),
+    ("dumb-ass", ["ass"]),
+    ("dumb.ass", []),
+    ("dumb:ass", []),
+    ("dumb’ass", []),
+    ("ass.hole", []),
+    ("ass'sy", []),
+    ("assume the mass assembly", []),
+    ("class: pass", []),
+    ("kick ass: now", ["ass"]),
+    ("ass...", ["ass"]),
+    ("1.ass", ["ass"]),
+    ("@ass_man", []),
+    ("#ass", ["ass"]),
+    ("moby dick", ["dick"]),
+    ("dickens", ["dick"]),
+    ("nothing to see here", []),
+]
+
+# The standard tokenizer keeps periods, colons and apostrophes that sit
+# between two letters inside the word.
+_TOKEN = re.compile(r"\w+(?:(?<=[^\W\d_])[.:'’](?=[^\W\d_])\w+)*")
+
+
+def _analyze(text):
+    """A model of the Elasticsearch standard analyzer for the corpus:
+    Unicode word splitting, then lowercasing.
+    """
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+
+def _query_matches(query, text):
+    # Both wildcard and plain terms are matched against single tokens.
+    terms = [clause[len("text:"):] for clause in query.split(" OR ")]
+    return any(
+        fnmatchcase(token, term) for token in _analyze(text) for term in terms
+    )
+
+
+@pytest.mark.parametrize("text,words", CORPUS)
+def test_queries_match_corpus(text, words):
+    queries = profanity_queries(load_lexicon())
+    assert [
+        word for word, query in queries.items() if _query_matches(query, text)
+    ] == words
+
+
+@pytest.mark.parametrize("text,words", CORPUS)
+def test_matcher_agrees_with_queries(text, words):
+    matcher = profanity_matcher(load_lexicon())
+    assert match_profanity(matcher, text.lower()) == words
@@ -0,0 +1,60 @@
+import pytest
+
+from profanity_power_index.timestamps import (
+    query_time_to_epoch_millis,
+    tweet_epoch_millis,
+    twitter_time_to_epoch_millis,
+)
+
+# 2020-10-23T02:00:00Z, during the last presidential debate.
+DEBATE_MILLIS = 1603418400000
+
+
+@pytest.mark.parametrize(
+    "query_time",
+    [
+        "2020-10-22T21:00:00-0500",
+        "2020-10-22T21:00:00-05:00",
+        "2020-10-23T02:00:00Z",
+        "2020-10-23T02:00:00+0000",
+    ],
+)
+def test_query_time_with_zone(query_time):
+    assert query_time_to_epoch_millis(query_time) == DEBATE_MILLIS
+
+
+@pytest.mark.parametrize(
+    "local_zone,query_time",
+    [
+        ("America/Chicago", "2020-10-22T21:00:00"),
+        ("UTC", "2020-10-23T02:00:00"),
+        ("Asia/Tokyo", "2020-10-23T11:00:00"),
+    ],
+)
+def test_query_time_without_zone_is_local(monkeypatch, local_zone, query_time):
+    monkeypatch.setenv("TZ", local_zone)
+
+    assert query_time_to_epoch_millis(query_time) == DEBATE_MILLIS
+
+
+def test_query_time_must_be_iso():
+    with pytest.raises(ValueError):
+        query_time_to_epoch_millis("10/22/2020 21:00")
+
+
+def test_twitter_time():
+    assert (
+        twitter_time_to_epoch_millis("Fri Oct 23 02:00:00 +0000 2020")
+        == DEBATE_MILLIS
+    )
+
+
+def test_tweet_time_prefers_timestamp_ms():
+    tweet = {
+        "created_at": "Fri Oct 23 02:00:00 +0000 2020",
+        "timestamp_ms": str(DEBATE_MILLIS + 123),
+    }
+
+    assert tweet_epoch_millis(tweet) == DEBATE_MILLIS + 123
+    del tweet["timestamp_ms"]
+    assert tweet_epoch_millis(tweet) == DEBATE_MILLIS
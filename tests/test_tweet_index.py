@@ -0,0 +1,75 @@
+import pytest
+
+from profanity_power_index.tweet_index import TWEET_MAPPING, create_tweet_index
+
+LEGACY_MAPPING = {
+    "tweet": {
+        "properties": {
+            "coordinates": {"type": "geo_point"},
+            "created_at": {
+                "type": "date",
+                "format": "EEE MMM dd HH:mm:ss Z yyyy",
+            },
+        }
+    }
+}
+
+
+class _Indices:
+    # Just enough of the Elasticsearch indices client for create_tweet_index.
+    def __init__(self, mappings):
+        self.mappings = mappings
+        self.settings = {}
+
+    def exists(self, index):
+        return index in self.mappings
+
+    def get_mapping(self, index):
+        return {index: {"mappings": self.mappings[index]}}
+
+    def put_settings(self, index, body):
+        self.settings[index] = body
+
+    def delete(self, index):
+        del self.mappings[index]
+
+    def create(self, index, body):
+        self.mappings[index] = body["mappings"]
+
+
+class _Elasticsearch:
+    def __init__(self, mappings):
+        self.indices = _Indices(mappings)
+
+
+def test_legacy_index_is_refused():
+    es_client = _Elasticsearch({"tweets": LEGACY_MAPPING})
+
+    with pytest.raises(ValueError, match="reindex"):
+        create_tweet_index(es_client, "tweets", refresh_interval="30s")
+    assert not es_client.indices.settings
+
+
+def test_legacy_index_can_be_dropped():
+    es_client = _Elasticsearch({"tweets": LEGACY_MAPPING})
+    create_tweet_index(es_client, "tweets", drop_index=True)
+
+    assert es_client.indices.mappings["tweets"] == TWEET_MAPPING["mappings"]
+
+
+@pytest.mark.parametrize(
+    "mappings",
+    [
+        TWEET_MAPPING["mappings"],
+        {"_doc": TWEET_MAPPING["mappings"]},
+        # A date without a format takes epoch millis too.
+        {"tweet": {"properties": {"created_at": {"type": "date"}}}},
+    ],
+)
+def test_current_index_is_reused(mappings):
+    es_client = _Elasticsearch({"tweets": mappings})
+    create_tweet_index(es_client, "tweets", refresh_interval="30s")
+
+    assert es_client.indices.settings["tweets"] == {
+        "index": {"refresh_interval": "30s"}
+    }